@@ -7,18 +7,19 @@ import asyncio
 import socket
 import sys
 import threading
+import tkinter as tk
 import webbrowser
 from pathlib import Path
+from tkinter import messagebox
 
 import customtkinter as ctk
 
 try:
-    import qrcode
-    from PIL import Image, ImageTk
+    import segno
     HAS_QR = True
 except ImportError:
     HAS_QR = False
-    print("Warning: qrcode or pillow not installed. Run: pip install qrcode[pil]")
+    print("Warning: segno not installed. Run: pip install segno")
 
 # Theme configuration
 ctk.set_appearance_mode("dark")
@@ -39,10 +40,26 @@ class AudioStreamApp(ctk.CTk):
         self.server_thread = None
         self.server_running = False
         self.loop = None
+        self._runner = None
+        self._shutdown_future = None
+        self._starting_server = False  # Prevent double-click issues
         self.devices = []
+        self._cached_ip = None
         
         self._setup_ui()
         
+        # Resolve the LAN IP up front so Start doesn't block on it
+        threading.Thread(target=self._cache_local_ip, daemon=True).start()
+        # Import server (aiortc, av) in the background; it dominates cold start
+        threading.Thread(target=self._preload_server, daemon=True).start()
+        
+        # One event loop for the app lifetime; Start/Stop only toggle the runner
+        self.loop = self._new_event_loop()
+        self.server_thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.server_thread.start()
+        
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        
     def _setup_ui(self):
         # Main container with padding
         container = ctk.CTkFrame(self, fg_color="transparent")
@@ -158,6 +175,7 @@ class AudioStreamApp(ctk.CTk):
             font=ctk.CTkFont(size=13)
         )
         self.device_combo.pack(fill="x")
+        self.device_combo.set("Loading devices...")
         self._populate_devices()
         
         # Start/Stop button
@@ -209,7 +227,11 @@ class AudioStreamApp(ctk.CTk):
             text_label.pack(side="left", padx=10)
     
     def _populate_devices(self):
-        """Populate device dropdown with available audio input devices."""
+        """Enumerate audio input devices on a background thread."""
+        threading.Thread(target=self._enumerate_devices_bg, daemon=True).start()
+    
+    def _enumerate_devices_bg(self):
+        """Query PortAudio devices off the UI thread (can take hundreds of ms)."""
         try:
             import sounddevice as sd
             devices = sd.query_devices()
@@ -228,14 +250,17 @@ class AudioStreamApp(ctk.CTk):
                             default_idx = len(input_devices)
                     input_devices.append((i, name))
             
-            self.devices = input_devices
-            device_names = [d[1] for d in input_devices]
-            self.device_combo.configure(values=device_names)
-            if device_names:
-                self.device_combo.set(device_names[default_idx])
+            self.after(0, lambda: self._on_devices_ready(input_devices, default_idx))
         except Exception as e:
             print(f"Error listing devices: {e}")
-            self.devices = []
+    
+    def _on_devices_ready(self, input_devices, default_idx):
+        """Fill the device dropdown once enumeration has finished."""
+        self.devices = input_devices
+        device_names = [d[1] for d in input_devices]
+        self.device_combo.configure(values=device_names)
+        if device_names:
+            self.device_combo.set(device_names[default_idx])
     
     def _get_local_ip(self):
         try:
@@ -247,27 +272,48 @@ class AudioStreamApp(ctk.CTk):
         except:
             return "127.0.0.1"
     
+    def _cache_local_ip(self):
+        """Resolve the LAN IP and remember it (loopback fallback is not cached)."""
+        ip = self._get_local_ip()
+        if ip != "127.0.0.1":
+            self._cached_ip = ip
+        return ip
+    
     def _generate_qr(self, url):
         if not HAS_QR:
             return None
             
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=2
-        )
-        qr.add_data(url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="#00d4ff", back_color="#1a1a2e")
-        return img
+        # Smallest regular (non-micro) QR symbol that fits the URL
+        qr = segno.make_qr(url, error="l", boost_error=False)
+        return [list(row) for row in qr.matrix_iter(border=2)]
+    
+    def _matrix_to_photo(self, matrix, size=180):
+        """Rasterize a QR module matrix into a tk PhotoImage (nearest-neighbor)."""
+        fg = "#00d4ff"
+        bg = "#1a1a2e"
+        
+        n = len(matrix)
+        scale = size // n
+        pad = (size - scale * n) // 2
+        
+        photo = tk.PhotoImage(width=size, height=size)
+        photo.put(bg, to=(0, 0, size, size))
+        
+        # Pre-expanded horizontal runs for one dark/light module
+        dark = " ".join([fg] * scale)
+        light = " ".join([bg] * scale)
+        
+        rows = []
+        for row in matrix:
+            row_str = "{" + " ".join(dark if bit else light for bit in row) + "}"
+            rows.extend([row_str] * scale)
+        photo.put(" ".join(rows), to=(pad, pad))
+        return photo
     
     def _update_qr_display(self, url):
-        img = self._generate_qr(url)
-        if img:
-            img = img.resize((180, 180), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
+        matrix = self._generate_qr(url)
+        if matrix:
+            photo = self._matrix_to_photo(matrix)
             self.qr_label.configure(image=photo, text="")
             self.qr_label.image = photo
         
@@ -278,13 +324,17 @@ class AudioStreamApp(ctk.CTk):
         if url.startswith("http"):
             webbrowser.open(url)
     
-    def _run_server(self):
-        # Direct import works in both dev mode and bundled EXE
+    def _preload_server(self):
+        """Import the server module ahead of the first Start click."""
+        try:
+            # Direct import works in both dev mode and bundled EXE
+            import server
+        except Exception as e:
+            print(f"Error preloading server: {e}")
+    
+    def _make_app(self):
+        """Build a fresh aiohttp application wired to the server handlers."""
         import server
-        
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
-        
         from aiohttp import web
         
         app = web.Application()
@@ -292,37 +342,97 @@ class AudioStreamApp(ctk.CTk):
         app.on_shutdown.append(server.on_shutdown)
         app.router.add_get("/", server.index)
         app.router.add_post("/offer", server.offer)
-        
-        runner = web.AppRunner(app)
-        self.loop.run_until_complete(runner.setup())
-        
-        site = web.TCPSite(runner, "0.0.0.0", 8080)
-        self.loop.run_until_complete(site.start())
-        
-        self.server_running = True
-        self.after(0, self._update_running_state)
+        return app
+    
+    def _new_event_loop(self):
+        """Create the server event loop, preferring uvloop/winloop when installed."""
+        try:
+            if sys.platform == "win32":
+                import winloop as fastloop
+            else:
+                import uvloop as fastloop
+            return fastloop.new_event_loop()
+        except ImportError:
+            return asyncio.new_event_loop()
+    
+    def _run_loop(self):
+        """Run the persistent server event loop (server thread)."""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
+    
+    async def _run_server(self, pending_shutdown=None):
+        """Set up the runner and bind the site (runs on the server loop)."""
+        if pending_shutdown:
+            # Let the previous server finish closing before on_startup runs
+            await asyncio.wait([asyncio.wrap_future(pending_shutdown)])
         
         try:
-            self.loop.run_forever()
-        except:
-            pass
-        finally:
-            self.loop.run_until_complete(runner.cleanup())
+            from aiohttp import web
+            
+            app = self._make_app()
+            
+            runner = web.AppRunner(app)
+            await runner.setup()
+            
+            # One acceptor only: server.py owns a single capture stream and peer set
+            site = web.TCPSite(runner, "0.0.0.0", 8080)
+            try:
+                await site.start()
+            except OSError:
+                # Bind failed: release the capture stream opened by on_startup
+                await runner.cleanup()
+                raise
+            
+            self._runner = runner
+            self.server_running = True
+            self.after(0, self._update_running_state)
+        except Exception as e:
+            print(f"Failed to start server: {e}")
+            self.after(0, self._on_server_error, f"Failed to start server: {e}")
+    
+    async def _shutdown_server(self):
+        """Close the site and peer connections, keeping the loop alive."""
+        runner, self._runner = self._runner, None
+        if runner:
+            await runner.cleanup()
     
     def _update_running_state(self):
+        self._starting_server = False
         self.status_var.set("Server running")
         self.status_dot.configure(text_color="#22c55e")
+    
+    def _on_server_error(self, error_msg):
+        """Called when server fails to start."""
+        self._starting_server = False
+        self.server_running = False
+        self.btn.configure(
+            text="▶  Start Server",
+            fg_color="#3b82f6",
+            hover_color="#2563eb"
+        )
+        self.status_var.set("Error")
+        self.status_dot.configure(text_color="#ef4444")
+        self.url_var.set("")
+        self.qr_label.configure(image="", text="Start server to generate QR code")
+        messagebox.showwarning("Server Error", error_msg)
         
     def _start_server(self):
+        # Prevent double-click issues
+        if self._starting_server or self.server_running:
+            return
+        
+        self._starting_server = True
         self.status_var.set("Starting...")
         self.status_dot.configure(text_color="#f59e0b")
         
-        ip = self._get_local_ip()
+        ip = self._cached_ip or self._cache_local_ip()
         url = f"http://{ip}:8080"
         self._update_qr_display(url)
         
-        self.server_thread = threading.Thread(target=self._run_server, daemon=True)
-        self.server_thread.start()
+        asyncio.run_coroutine_threadsafe(
+            self._run_server(self._shutdown_future), self.loop
+        )
         
         self.btn.configure(
             text="⬛  Stop Server",
@@ -334,8 +444,8 @@ class AudioStreamApp(ctk.CTk):
         self.status_var.set("Stopping...")
         self.status_dot.configure(text_color="#f59e0b")
         
-        if self.loop:
-            self.loop.call_soon_threadsafe(self.loop.stop)
+        future = asyncio.run_coroutine_threadsafe(self._shutdown_server(), self.loop)
+        self._shutdown_future = future
             
         self.server_running = False
         self.btn.configure(
@@ -348,11 +458,23 @@ class AudioStreamApp(ctk.CTk):
         self.url_var.set("")
         self.qr_label.configure(image="", text="Start server to generate QR code")
         
+        return future
+        
     def _toggle_server(self):
         if self.server_running:
             self._stop_server()
         else:
             self._start_server()
+    
+    def _on_close(self):
+        """Clean up on window close."""
+        if self.server_running:
+            try:
+                self._stop_server().result(timeout=5)
+            except Exception as e:
+                print(f"Error stopping server: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.destroy()
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ Modern GUI with Qt for sleek Apple/Material-inspired design.
 """
 
 import asyncio
+import errno
 import socket
 import sys
 import threading
@@ -18,12 +19,11 @@ from PyQt6.QtCore import Qt, QSize, pyqtSignal, QObject
 from PyQt6.QtGui import QPixmap, QFont, QPalette, QColor, QCursor, QImage
 
 try:
-    import qrcode
-    from PIL import Image
+    import segno
     HAS_QR = True
 except ImportError:
     HAS_QR = False
-    print("Warning: qrcode or pillow not installed. Run: pip install qrcode[pil]")
+    print("Warning: segno not installed. Run: pip install segno")
 
 
 # Modern dark theme stylesheet
@@ -139,6 +139,7 @@ class SignalEmitter(QObject):
     update_status = pyqtSignal(str, str)  # status_text, dot_color
     server_started = pyqtSignal()
     server_error = pyqtSignal(str)  # error message
+    devices_ready = pyqtSignal(list, int)  # input_devices, default_idx
 
 
 class AudioStreamApp(QMainWindow):
@@ -151,17 +152,31 @@ class AudioStreamApp(QMainWindow):
         self.server_thread = None
         self.server_running = False
         self.loop = None
+        self._runner = None
+        self._shutdown_future = None
         self.devices = []
+        self._cached_ip = None
         
         self.signals = SignalEmitter()
         self.signals.update_status.connect(self._update_status_slot)
         self.signals.server_started.connect(self._on_server_started)
         self.signals.server_error.connect(self._on_server_error)
+        self.signals.devices_ready.connect(self._on_devices_ready)
         
         self._starting_server = False  # Prevent double-click issues
         
         self._setup_ui()
         
+        # Resolve the LAN IP up front so Start doesn't block on it
+        threading.Thread(target=self._cache_local_ip, daemon=True).start()
+        # Import server (aiortc, av) in the background; it dominates cold start
+        threading.Thread(target=self._preload_server, daemon=True).start()
+        
+        # One event loop for the app lifetime; Start/Stop only toggle the runner
+        self.loop = self._new_event_loop()
+        self.server_thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.server_thread.start()
+        
     def _setup_ui(self):
         # Central widget
         central = QWidget()
@@ -300,7 +315,11 @@ class AudioStreamApp(QMainWindow):
         main_layout.addStretch()
     
     def _populate_devices(self):
-        """Populate device dropdown with available audio input devices."""
+        """Enumerate audio input devices on a background thread."""
+        threading.Thread(target=self._enumerate_devices_bg, daemon=True).start()
+    
+    def _enumerate_devices_bg(self):
+        """Query PortAudio devices off the UI thread (can take hundreds of ms)."""
         try:
             import sounddevice as sd
             devices = sd.query_devices()
@@ -319,17 +338,20 @@ class AudioStreamApp(QMainWindow):
                             default_idx = len(input_devices)
                     input_devices.append((i, name))
             
-            self.devices = input_devices
-            self.device_combo.clear()
-            for _, name in input_devices:
-                self.device_combo.addItem(name)
-            
-            if input_devices:
-                self.device_combo.setCurrentIndex(default_idx)
+            self.signals.devices_ready.emit(input_devices, default_idx)
                 
         except Exception as e:
             print(f"Error listing devices: {e}")
-            self.devices = []
+    
+    def _on_devices_ready(self, input_devices, default_idx):
+        """Fill the device dropdown once enumeration has finished."""
+        self.devices = input_devices
+        self.device_combo.clear()
+        for _, name in input_devices:
+            self.device_combo.addItem(name)
+        
+        if input_devices:
+            self.device_combo.setCurrentIndex(default_idx)
     
     def _get_local_ip(self):
         try:
@@ -341,34 +363,50 @@ class AudioStreamApp(QMainWindow):
         except:
             return "127.0.0.1"
     
+    def _cache_local_ip(self):
+        """Resolve the LAN IP and remember it (loopback fallback is not cached)."""
+        ip = self._get_local_ip()
+        if ip != "127.0.0.1":
+            self._cached_ip = ip
+        return ip
+    
     def _generate_qr(self, url):
         if not HAS_QR:
             return None
             
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=2
-        )
-        qr.add_data(url)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="#00d4ff", back_color="#1a1a2e")
-        return img
+        # Smallest regular (non-micro) QR symbol that fits the URL
+        qr = segno.make_qr(url, error="l", boost_error=False)
+        return [list(row) for row in qr.matrix_iter(border=2)]
     
-    def _pil_to_pixmap(self, pil_image):
-        """Convert PIL Image to QPixmap."""
-        pil_image = pil_image.convert("RGB")
-        data = pil_image.tobytes("raw", "RGB")
-        qimage = QImage(data, pil_image.width, pil_image.height, QImage.Format.Format_RGB888)
+    def _matrix_to_pixmap(self, matrix, size=180):
+        """Rasterize a QR module matrix into a QPixmap (nearest-neighbor)."""
+        fg = b"\x00\xd4\xff"  # #00d4ff
+        bg = b"\x1a\x1a\x2e"  # #1a1a2e
+        
+        n = len(matrix)
+        scale = size // n
+        pad = (size - scale * n) // 2
+        stride = size * 3
+        
+        buf = bytearray(bg * (size * size))
+        for y, row in enumerate(matrix):
+            line = bytearray(bg * size)
+            for x, bit in enumerate(row):
+                if bit:
+                    start = (pad + x * scale) * 3
+                    line[start:start + scale * 3] = fg * scale
+            top = (pad + y * scale) * stride
+            for dy in range(scale):
+                offset = top + dy * stride
+                buf[offset:offset + stride] = line
+        
+        qimage = QImage(bytes(buf), size, size, stride, QImage.Format.Format_RGB888)
         return QPixmap.fromImage(qimage)
     
     def _update_qr_display(self, url):
-        img = self._generate_qr(url)
-        if img:
-            img = img.resize((180, 180), Image.Resampling.LANCZOS)
-            pixmap = self._pil_to_pixmap(img)
+        matrix = self._generate_qr(url)
+        if matrix:
+            pixmap = self._matrix_to_pixmap(matrix)
             self.qr_label.setPixmap(pixmap)
             self.qr_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         
@@ -379,54 +417,88 @@ class AudioStreamApp(QMainWindow):
         if url.startswith("http"):
             webbrowser.open(url)
     
-    def _is_port_available(self, port=8080):
-        """Check if port is available before attempting to start server."""
+    def _preload_server(self):
+        """Import the server module ahead of the first Start click."""
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.bind(('0.0.0.0', port))
-                return True
-        except OSError:
-            return False
+            # Direct import works in both dev mode and bundled EXE
+            import server
+        except Exception as e:
+            print(f"Error preloading server: {e}")
     
-    def _run_server(self):
+    def _make_app(self):
+        """Build a fresh aiohttp application wired to the server handlers."""
+        import server
+        from aiohttp import web
+        
+        app = web.Application()
+        app.on_startup.append(server.on_startup)
+        app.on_shutdown.append(server.on_shutdown)
+        app.router.add_get("/", server.index)
+        app.router.add_post("/offer", server.offer)
+        return app
+    
+    def _new_event_loop(self):
+        """Create the server event loop, preferring uvloop/winloop when installed."""
+        try:
+            if sys.platform == "win32":
+                import winloop as fastloop
+            else:
+                import uvloop as fastloop
+            return fastloop.new_event_loop()
+        except ImportError:
+            return asyncio.new_event_loop()
+    
+    def _run_loop(self):
+        """Run the persistent server event loop (server thread)."""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
+    
+    async def _run_server(self, pending_shutdown=None):
+        """Set up the runner and bind the site (runs on the server loop)."""
+        if pending_shutdown:
+            # Let the previous server finish closing before on_startup runs
+            await asyncio.wait([asyncio.wrap_future(pending_shutdown)])
+        
         try:
-            import server
-            
-            self.loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.loop)
-            
             from aiohttp import web
             
-            app = web.Application()
-            app.on_startup.append(server.on_startup)
-            app.on_shutdown.append(server.on_shutdown)
-            app.router.add_get("/", server.index)
-            app.router.add_post("/offer", server.offer)
+            app = self._make_app()
             
             runner = web.AppRunner(app)
-            self.loop.run_until_complete(runner.setup())
+            await runner.setup()
             
+            # One acceptor only: server.py owns a single capture stream and peer set
             site = web.TCPSite(runner, "0.0.0.0", 8080)
-            self.loop.run_until_complete(site.start())
+            try:
+                await site.start()
+            except OSError:
+                # Bind failed: release the capture stream opened by on_startup
+                await runner.cleanup()
+                raise
             
+            self._runner = runner
             self.server_running = True
             self.signals.server_started.emit()
-            
-            try:
-                self.loop.run_forever()
-            except:
-                pass
-            finally:
-                self.loop.run_until_complete(runner.cleanup())
                 
         except OSError as e:
-            if e.errno == 10048:  # Port already in use on Windows
-                self.signals.server_error.emit("Port 8080 is already in use. Close other instances first.")
+            if e.errno in (errno.EADDRINUSE, 10048):  # 10048 = WSAEADDRINUSE on Windows
+                self.signals.server_error.emit(
+                    "Port 8080 is already in use.\n\n"
+                    "Please close any other Audio Stream instances or \n"
+                    "applications using port 8080 and try again."
+                )
             else:
                 self.signals.server_error.emit(f"Server error: {e}")
         except Exception as e:
             self.signals.server_error.emit(f"Failed to start server: {e}")
     
+    async def _shutdown_server(self):
+        """Close the site and peer connections, keeping the loop alive."""
+        runner, self._runner = self._runner, None
+        if runner:
+            await runner.cleanup()
+    
     def _update_status_slot(self, text, color):
         """Thread-safe status update slot."""
         self.status_label.setText(text)
@@ -457,27 +529,17 @@ class AudioStreamApp(QMainWindow):
         if self._starting_server or self.server_running:
             return
         
-        # Check if port is available first
-        if not self._is_port_available(8080):
-            QMessageBox.warning(
-                self, 
-                "Port In Use", 
-                "Port 8080 is already in use.\n\n"
-                "Please close any other Audio Stream instances or \n"
-                "applications using port 8080 and try again."
-            )
-            return
-        
         self._starting_server = True
         self.status_label.setText("Starting...")
         self.status_dot.setStyleSheet("color: #f59e0b;")
         
-        ip = self._get_local_ip()
+        ip = self._cached_ip or self._cache_local_ip()
         url = f"http://{ip}:8080"
         self._update_qr_display(url)
         
-        self.server_thread = threading.Thread(target=self._run_server, daemon=True)
-        self.server_thread.start()
+        asyncio.run_coroutine_threadsafe(
+            self._run_server(self._shutdown_future), self.loop
+        )
         
         self.btn.setText("⬛  Stop Server")
         self.btn.setObjectName("stop_btn")
@@ -487,8 +549,8 @@ class AudioStreamApp(QMainWindow):
         self.status_label.setText("Stopping...")
         self.status_dot.setStyleSheet("color: #f59e0b;")
         
-        if self.loop:
-            self.loop.call_soon_threadsafe(self.loop.stop)
+        future = asyncio.run_coroutine_threadsafe(self._shutdown_server(), self.loop)
+        self._shutdown_future = future
             
         self.server_running = False
         self.btn.setText("▶  Start Server")
@@ -500,6 +562,7 @@ class AudioStreamApp(QMainWindow):
         self.url_label.setText("")
         self.qr_label.setPixmap(QPixmap())
         self.qr_label.setText("Start server to generate QR code")
+        return future
         
     def _toggle_server(self):
         if self.server_running:
@@ -510,7 +573,11 @@ class AudioStreamApp(QMainWindow):
     def closeEvent(self, event):
         """Clean up on window close."""
         if self.server_running:
-            self._stop_server()
+            try:
+                self._stop_server().result(timeout=5)
+            except Exception as e:
+                print(f"Error stopping server: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
         event.accept()
 
 
@@ -1,31 +1,54 @@
 """
-Build script for creating Windows EXE using PyInstaller.
-Run: python build.py
+Build script for creating Windows EXEs using PyInstaller.
+Run: python build.py [--target=ctk|pyqt|all] [--upx-dir=PATH]
 """
 
+import argparse
+import importlib.util
+import os
+import shutil
 import subprocess
 import sys
 from pathlib import Path
 
-def main():
-    # Check PyInstaller is installed
-    try:
-        import PyInstaller
-    except ImportError:
-        print("Installing PyInstaller...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "pyinstaller"])
-    
-    # Build command
-    script_dir = Path(__file__).parent
-    
-    # Path separator: ; on Windows, : on Linux/Mac
-    import platform
-    sep = ";" if platform.system() == "Windows" else ":"
-    
+# Per-target settings: output name, entry script, extra PyInstaller args
+TARGETS = {
+    "ctk": {
+        "name": "AudioStream",
+        "script": "app.py",
+        "args": [
+            "--exclude-module=PyQt6",
+        ],
+    },
+    "pyqt": {
+        "name": "AudioStreamPyQt",
+        "script": "app_pyqt.py",
+        "args": [
+            "--add-data={script_dir}/server.py{sep}.",
+            "--hidden-import=PyQt6",
+            "--exclude-module=tkinter",
+        ],
+    },
+}
+
+
+# DLLs known to break when UPX-compressed
+UPX_EXCLUDES = [
+    "vcruntime140.dll",
+    f"python{sys.version_info.major}{sys.version_info.minor}.dll",
+]
+
+
+def build(target, script_dir, sep, upx_dir=None):
+    """Run PyInstaller for one target and zip the resulting folder."""
+    config = TARGETS[target]
+    name = config["name"]
+
     cmd = [
         sys.executable, "-m", "PyInstaller",
-        "--name=AudioStream",
-        "--onefile",
+        f"--name={name}",
+        "--onedir",  # No per-launch self-extraction to %TEMP%
+        "--contents-directory=lib",
         "--windowed",  # No console window
         "--icon=NONE",  # No custom icon (you can add one later)
         f"--add-data={script_dir / 'client.html'}{sep}.",
@@ -36,25 +59,71 @@ def main():
         "--hidden-import=av",
         "--hidden-import=sounddevice",
         "--hidden-import=numpy",
-        "--hidden-import=qrcode",
-        "--hidden-import=PIL",
+        "--hidden-import=segno",
         "--hidden-import=fractions",
-        "--collect-all=aiortc",
-        "--collect-all=av",
-        str(script_dir / "app.py")
+        "--optimize=2",  # Strip docstrings/asserts from bundled bytecode
+        "--exclude-module=unittest",
+        "--exclude-module=test",
+        "--exclude-module=pydoc_data",
+        "--exclude-module=distutils",
+        "--collect-submodules=aiortc",  # aiortc ships no data files
+        "--collect-submodules=av",  # av/__init__ imports av.video, so keep it all
+        "--collect-binaries=av",  # Bundled FFmpeg DLLs
     ]
-    
-    print("Building AudioStream.exe...")
+    cmd += [arg.format(script_dir=script_dir, sep=sep) for arg in config["args"]]
+    if upx_dir:
+        # Smaller DLLs on disk; worth it only where disk reads dominate startup
+        cmd.append(f"--upx-dir={upx_dir}")
+        cmd += [f"--upx-exclude={dll}" for dll in UPX_EXCLUDES]
+    cmd.append(str(script_dir / config["script"]))
+
+    print(f"Building {name}...")
     print("This may take a few minutes...")
     print()
-    
-    subprocess.run(cmd)
-    
+
+    subprocess.run(cmd, check=True)
+
+    # Zip the onedir folder for distribution
+    dist_dir = script_dir / "dist"
+    archive = shutil.make_archive(str(dist_dir / name), "zip", dist_dir, name)
+
     print()
     print("=" * 50)
     print("Build complete!")
-    print(f"EXE location: {script_dir / 'dist' / 'AudioStream.exe'}")
+    print(f"EXE location: {dist_dir / name / f'{name}.exe'}")
+    print(f"Zip archive: {archive}")
     print("=" * 50)
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Build Audio Stream executables.")
+    parser.add_argument(
+        "--target",
+        choices=[*TARGETS, "all"],
+        default="ctk",
+        help="ctk (CustomTkinter), pyqt (PyQt6) or all (default: ctk)",
+    )
+    parser.add_argument(
+        "--upx-dir",
+        default=os.environ.get("UPX_DIR"),
+        help="folder containing upx.exe to compress bundled DLLs (default: $UPX_DIR)",
+    )
+    args = parser.parse_args()
+
+    # Check PyInstaller is installed (find_spec doesn't execute its __init__)
+    if importlib.util.find_spec("PyInstaller") is None:
+        print("Installing PyInstaller...")
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "pyinstaller"])
+
+    script_dir = Path(__file__).parent
+
+    # Path separator: ; on Windows, : on Linux/Mac
+    import platform
+    sep = ";" if platform.system() == "Windows" else ":"
+
+    targets = list(TARGETS) if args.target == "all" else [args.target]
+    for target in targets:
+        build(target, script_dir, sep, args.upx_dir)
+
 if __name__ == "__main__":
     main()
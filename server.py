@@ -4,6 +4,9 @@ Streams system audio to connected clients via WebRTC.
 """
 
 import asyncio
+import functools
+import gzip
+import hashlib
 import json
 import os
 import socket
@@ -12,7 +15,6 @@ import fractions
 import logging
 
 import numpy as np
-import sounddevice as sd
 import av
 from aiohttp import web
 
@@ -32,7 +34,11 @@ def resource_path(relative_path):
 # Audio config
 SAMPLE_RATE = 48000
 CHANNELS = 2
-FRAME_SAMPLES = 960  # 20ms at 48kHz (standard for Opus)
+TIME_BASE = fractions.Fraction(1, SAMPLE_RATE)
+# 20ms at 48kHz (standard for Opus). Larger blocks don't save packets: aiortc's
+# Opus encoder re-frames to 20ms and sends all payloads with one RTP timestamp.
+FRAME_SAMPLES = 960
+RING_SLOTS = 40  # Preallocated capture blocks, twice the queue depth
 
 # Globals
 pcs = set()
@@ -47,14 +53,33 @@ class SystemAudioTrack(AudioStreamTrack):
 
     def __init__(self):
         super().__init__()
-        self._queue = asyncio.Queue(maxsize=20)
-        self._sample_count = 0
+        # Ring slots are int16 views over preallocated frames: no per-frame allocs
+        self._frames = []
+        self._ring = []
+        for _ in range(RING_SLOTS):
+            frame = av.AudioFrame(format='s16', layout='stereo', samples=FRAME_SAMPLES)
+            frame.sample_rate = SAMPLE_RATE
+            frame.time_base = TIME_BASE
+            self._frames.append(frame)
+            self._ring.append(
+                np.frombuffer(frame.planes[0], dtype=np.int16).reshape(FRAME_SAMPLES, CHANNELS)
+            )
+        self._capture_idx = 0  # Next slot to fill (audio thread)
+        self._write_idx = 0  # Blocks published to the loop (asyncio loop)
+        self._read_idx = 0  # Next block for recv() (asyncio loop)
+        self._wake = asyncio.Event()
         self._start_time = None
         self._loop = None
         self._stream = None
+        self._meter_task = None
+        self._thread_boosted = False
+        self._level_buf = np.empty((FRAME_SAMPLES, CHANNELS), dtype=np.int32)
         
     async def start_capture(self):
         """Start audio capture (must be called from async context)."""
+        # Imported here: loading sounddevice initializes PortAudio
+        import sounddevice as sd
+        
         self._loop = asyncio.get_running_loop()
         
         device = self._find_loopback()
@@ -70,10 +95,12 @@ class SystemAudioTrack(AudioStreamTrack):
             latency='low'
         )
         self._stream.start()
+        self._meter_task = asyncio.ensure_future(self._meter_levels())
         logging.info("Audio capture started")
         
     def _find_loopback(self):
         """Find loopback/monitor device (Windows: VB-Cable, Linux: PulseAudio monitor)."""
+        import sounddevice as sd
         devices = sd.query_devices()
         
         priority_keywords = [
@@ -85,11 +112,16 @@ class SystemAudioTrack(AudioStreamTrack):
             'what u hear',
         ]
         
+        # Lowercase each input device name once, not once per keyword
+        candidates = [
+            (i, d['name'].lower()) for i, d in enumerate(devices)
+            if d['max_input_channels'] > 0
+        ]
+        
         for keyword in priority_keywords:
-            for i, d in enumerate(devices):
-                name = d['name'].lower()
-                if d['max_input_channels'] > 0 and keyword in name:
-                    print(f"Selected: {d['name']}")
+            for i, name in candidates:
+                if keyword in name:
+                    print(f"Selected: {devices[i]['name']}")
                     return i
         
         print("Using default audio input device")
@@ -100,45 +132,76 @@ class SystemAudioTrack(AudioStreamTrack):
         if status:
             print(f"Audio status: {status}", file=sys.stderr)
         
-        self._sample_count += frames
-        if self._sample_count % SAMPLE_RATE < frames:
-            rms = np.sqrt(np.mean(indata.astype(np.float32)**2))
-            print(f"[Audio] Level: {rms:.4f}")
+        if not self._thread_boosted:
+            self._thread_boosted = True
+            if sys.platform == "win32":
+                self._boost_thread_priority()
+        
+        # Copy into a preallocated slot; only the index crosses threads
+        idx = self._capture_idx
+        np.copyto(self._ring[idx % RING_SLOTS], indata)
+        self._capture_idx = idx + 1
         
         try:
-            self._loop.call_soon_threadsafe(
-                self._push_frame, 
-                indata.copy()
-            )
+            self._loop.call_soon_threadsafe(self._push_index, idx)
         except Exception as e:
             print(f"Callback error: {e}", file=sys.stderr)
             
-    def _push_frame(self, data):
-        """Push audio data to queue (runs on asyncio loop)."""
-        if self._queue.full():
-            try:
-                self._queue.get_nowait()
-            except asyncio.QueueEmpty:
-                pass
+    def _boost_thread_priority(self):
+        """Register the audio callback thread with MMCSS as "Pro Audio" (Windows)."""
+        import ctypes
+        from ctypes import wintypes
+        
         try:
-            self._queue.put_nowait(data)
-        except asyncio.QueueFull:
-            pass
+            avrt = ctypes.windll.avrt
+            avrt.AvSetMmThreadCharacteristicsW.argtypes = [
+                wintypes.LPCWSTR, ctypes.POINTER(wintypes.DWORD)
+            ]
+            avrt.AvSetMmThreadCharacteristicsW.restype = wintypes.HANDLE
+            task_index = wintypes.DWORD(0)
+            if not avrt.AvSetMmThreadCharacteristicsW("Pro Audio", ctypes.byref(task_index)):
+                print(f"MMCSS registration failed: {ctypes.GetLastError()}", file=sys.stderr)
+        except Exception as e:
+            print(f"MMCSS registration failed: {e}", file=sys.stderr)
+            
+    def _push_index(self, idx):
+        """Publish a filled ring slot and wake recv() (runs on asyncio loop)."""
+        self._write_idx = idx + 1
+        self._wake.set()
 
     async def recv(self):
         """Called by aiortc to get next audio frame."""
-        data = await self._queue.get()
+        while self._read_idx == self._write_idx:
+            self._wake.clear()
+            await self._wake.wait()
+        
+        # Drop stale blocks if we fell behind, keeping clear of the writer
+        if self._write_idx - self._read_idx > RING_SLOTS // 2:
+            self._read_idx = self._write_idx - RING_SLOTS // 2
         
-        packed = data.reshape(1, -1)
+        idx = self._read_idx
+        self._read_idx += 1
         
-        frame = av.AudioFrame.from_ndarray(packed, format='s16', layout='stereo')
-        frame.sample_rate = SAMPLE_RATE
-        frame.pts = self._sample_count
-        frame.time_base = fractions.Fraction(1, SAMPLE_RATE)
+        # The writer stays RING_SLOTS // 2 blocks clear of this slot (>= 400ms)
+        frame = self._frames[idx % RING_SLOTS]
+        frame.pts = idx * FRAME_SAMPLES
         
         return frame
     
+    async def _meter_levels(self):
+        """Log the input level once per second, off the capture and recv() paths."""
+        while True:
+            await asyncio.sleep(1)
+            if self._write_idx:
+                data = self._ring[(self._write_idx - 1) % RING_SLOTS]
+                # Integer RMS: int16 squares fit in int32, summed in int64
+                np.multiply(data, data, out=self._level_buf, dtype=np.int32)
+                rms = np.sqrt(self._level_buf.sum(dtype=np.int64) / data.size)
+                print(f"[Audio] Level: {rms:.4f}")
+    
     def stop(self):
+        if self._meter_task:
+            self._meter_task.cancel()
         if self._stream:
             self._stream.stop()
             self._stream.close()
@@ -147,9 +210,25 @@ class SystemAudioTrack(AudioStreamTrack):
 
 # HTTP Handlers
 async def index(request):
-    html_path = resource_path("client.html")
-    with open(html_path, "r", encoding="utf-8") as f:
-        return web.Response(text=f.read(), content_type="text/html")
+    app = request.app
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        body, etag, encoding = app["client_html_gz"], app["client_etag_gz"], "gzip"
+    else:
+        body, etag, encoding = app["client_html"], app["client_etag"], None
+    
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if request.headers.get("If-None-Match") == etag:
+        return web.Response(status=304, headers=headers)
+    
+    headers["Cache-Control"] = "public, max-age=3600"
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return web.Response(
+        body=body,
+        content_type="text/html",
+        charset="utf-8",
+        headers=headers,
+    )
 
 
 async def offer(request):
@@ -181,37 +260,58 @@ async def offer(request):
 
 async def on_startup(app):
     global audio_track
+    # Serve the page from memory instead of re-reading it per request. It is a
+    # few KB, so a FileResponse/sendfile path would save nothing and lose gzip.
+    with open(resource_path("client.html"), "rb") as f:
+        app["client_html"] = f.read()
+    app["client_etag"] = f'"{hashlib.md5(app["client_html"]).hexdigest()}"'
+    # Compressed once here, so gzip costs nothing per request
+    app["client_html_gz"] = gzip.compress(app["client_html"], compresslevel=9)
+    app["client_etag_gz"] = app["client_etag"][:-1] + '-gzip"'
+    
     audio_track = SystemAudioTrack()
     await audio_track.start_capture()
 
 
 async def on_shutdown(app):
-    coros = [pc.close() for pc in pcs]
-    await asyncio.gather(*coros)
+    # Snapshot before awaiting: a restart during the await registers new peers
+    # and rebinds audio_track, and those must not be torn down here
+    current = list(pcs)
     pcs.clear()
-    if audio_track:
-        audio_track.stop()
+    track = audio_track
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(pc.close() for pc in current), return_exceptions=True),
+            timeout=2.0,
+        )
+    except asyncio.TimeoutError:
+        logging.warning("Timed out closing peer connections")
+    if track:
+        track.stop()
 
 
+@functools.lru_cache(maxsize=None)
 def get_local_ips():
+    """Return LAN IPv4 addresses, cached for the process lifetime."""
     ips = []
-    try:
-        hostname = socket.gethostname()
-        for ip in socket.gethostbyname_ex(hostname)[2]:
-            if not ip.startswith("127."):
-                ips.append(ip)
-    except:
-        pass
+    # Connecting a UDP socket only selects a route; no packet is sent
     try:
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         s.connect(("8.8.8.8", 80))
-        ip = s.getsockname()[0]
+        ips.append(s.getsockname()[0])
         s.close()
-        if ip not in ips:
-            ips.append(ip)
-    except:
+    except OSError:
         pass
-    return ips or ["127.0.0.1"]
+    # No default route: fall back to the addresses bound to our hostname
+    if not ips:
+        try:
+            for info in socket.getaddrinfo(socket.gethostname(), None, socket.AF_INET):
+                ip = info[4][0]
+                if not ip.startswith("127.") and ip not in ips:
+                    ips.append(ip)
+        except OSError:
+            pass
+    return tuple(ips) or ("127.0.0.1",)
 
 
 if __name__ == "__main__":
@@ -228,4 +328,14 @@ if __name__ == "__main__":
         print(f"  http://{ip}:8080")
     print("=" * 60)
     
+    # Faster event loop when installed (falls back to stdlib asyncio)
+    try:
+        if sys.platform == "win32":
+            import winloop as fastloop
+        else:
+            import uvloop as fastloop
+        asyncio.set_event_loop_policy(fastloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
     web.run_app(app, host="0.0.0.0", port=8080, print=None)